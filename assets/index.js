@@ -1,10 +1,31 @@
-const BOOT = JSON.parse(atob('%BOOT%'));
 // --- Global State ---
+// Launch options, fetched from Api.get_boot_data once the bridge is up
+let BOOT = {};
+let bootPromise = null;
 let editor;
 let monaco;
 let tabs = [];
 let nextTabId = 0;
 let activeTabId = -1;
+let monacoPromise = null;
+let editorPromise = null;
+let pendingTabOps = [];
+let initialTextPromise = null;
+const extToLang = new Map();
+const tabEls = new Map();
+const tabById = new Map();
+const tabByPath = new Map();
+const LARGE_FILE_CHARS = 1 << 20;
+const FALLBACK_PREVIEW_CHARS = 64 * 1024;
+const MODEL_CACHE_SIZE = 16;
+const SAVE_CHUNK_CHARS = 256 * 1024;
+const modelCache = new Map();
+let tabVisualsPending = false;
+let titleSyncPending = false;
+let lastTitleSync = { path: undefined, isDirty: undefined };
+// Textareas normalize CRLF/CR to LF, so fallback.value is only used if the user typed into it
+let fallbackEdited = false;
+let bootFailed = false;
 
 // --- Find/Replace State ---
 let currentMatches = [];
@@ -198,20 +219,170 @@ function copySurgicalSchema() {
 }
 
 // --- MONACO BOOT ---
+// Show a plain textarea immediately and defer the multi-MB Monaco download/parse
+// until the user actually reaches for the editor (or the browser is idle).
+function mountFallback() {
+  const el = document.getElementById('editor');
+  const textArea = document.createElement('textarea');
+  textArea.id = 'fallback-editor';
+  textArea.spellcheck = false;
+  textArea.readOnly = true;
+  textArea.placeholder = 'Loading...';
+  textArea.addEventListener('input', () => { fallbackEdited = true; }, { once: true });
+  el.appendChild(textArea);
+
+  const tabEl = document.createElement('div');
+  tabEl.className = 'tab active';
+  const nameEl = document.createElement('span');
+  nameEl.id = 'fallback-tab-name';
+  tabEl.appendChild(nameEl);
+  document.getElementById('tabs-container').appendChild(tabEl);
+}
+
+// Labels the provisional tab once the boot data has arrived
+function labelFallback() {
+  const nameEl = document.getElementById('fallback-tab-name');
+  if (nameEl) nameEl.textContent = BOOT.displayName || 'Untitled';
+  const statusFilepath = document.getElementById('status-filepath');
+  if (statusFilepath && !monaco) {
+      statusFilepath.textContent = BOOT.path || '[Untitled]';
+  }
+}
+
+// Resolves once pywebview has injected the JS API bridge
+function whenApiReady() {
+  if (window.pywebview && window.pywebview.api && window.pywebview.api.get_boot_data) {
+    return Promise.resolve(window.pywebview.api);
+  }
+  return new Promise(resolve => {
+    window.addEventListener('pywebviewready', () => resolve(window.pywebview.api), { once: true });
+  });
+}
+
+function loadBoot() {
+  if (!bootPromise) {
+    bootPromise = whenApiReady().then(api => api.get_boot_data()).then(boot => {
+      BOOT = boot || {};
+      return BOOT;
+    });
+  }
+  return bootPromise;
+}
+
+// File bodies come over the local HTTP route, not the JS API bridge. Decoded by hand:
+// Response.text() strips a UTF-8 BOM, which the next save would then drop from the file.
+const fileDecoder = new TextDecoder('utf-8', { ignoreBOM: true });
+
+function fetchFile(token) {
+  return fetch('/file?token=' + encodeURIComponent(token));
+}
+
+async function readFileBody(r) {
+  return fileDecoder.decode(await r.arrayBuffer());
+}
+
+// The boot file loads through /file too, using the token handed out in BOOT
+function loadInitialText() {
+  if (!initialTextPromise) {
+    initialTextPromise = loadBoot().then(async boot => {
+      if (!boot.fileToken) return '';
+      const r = await fetchFile(boot.fileToken);
+      if (r.ok) return readFileBody(r);
+      // 404: a --file that doesn't exist yet starts as an empty buffer. Anything else (a 410
+      // for a spent token after a reload, a 403) must not leave an empty buffer bound to the path.
+      if (r.status === 404) return '';
+      throw new Error(`Failed to read file:\n${boot.path}\n\n${r.status} ${r.statusText}`);
+    });
+  }
+  return initialTextPromise;
+}
+
+function ensureMonaco() {
+  if (monacoPromise) return monacoPromise;
+  monacoPromise = loadBoot().then(() => new Promise((resolve, reject) => {
+    const s = document.createElement('script');
+    s.src = BOOT.vsPath + '/loader.js';
+    s.onload = () => {
+      if (!window.require) { reject(new Error('[monaco] AMD loader not present')); return; }
+      window.require.config({ paths: { 'vs': BOOT.vsPath } });
+      window.require(['vs/editor/editor.main'], resolve, reject);
+    };
+    s.onerror = () => reject(new Error('[monaco] failed to load loader.js'));
+    document.head.appendChild(s);
+  }));
+  return monacoPromise;
+}
+
 function bootMonaco() {
-  if (!window.require) { console.error('[monaco] AMD loader not present'); return; }
-  window.require.config({ paths: { 'vs': 'https://cdn.jsdelivr.net/npm/monaco-editor@0.45.0/min/vs' } });
-  window.require(['vs/editor/editor.main'], function (m) {
+  if (!editorPromise) {
+    editorPromise = ensureMonaco()
+      .then(mountMonaco)
+      .catch(failBoot);
+  }
+  return editorPromise;
+}
+
+// Monaco couldn't load (no assets/vs and no network, or the file couldn't be read): say so,
+// and stop taking edits in the fallback that could never be saved
+function failBoot(e) {
+  console.error(e);
+  if (bootFailed) return;
+  bootFailed = true;
+  pendingTabOps.length = 0;
+  const fallback = document.getElementById('fallback-editor');
+  if (fallback) fallback.readOnly = true;
+  const reason = (e && e.message) || String(e);
+  whenApiReady().then(api => api.create_alert('Editor Error', `The editor failed to load; editing and saving are disabled.\n\n${reason}`));
+}
+
+// Runs fn once Monaco is up; does nothing if it failed to load
+function withEditor(fn) {
+  return bootMonaco().then(() => { if (editor) fn(); });
+}
+
+// Tab operations requested before Monaco is ready (menu New/Open, Save) are
+// replayed once the editor has mounted.
+function queueTabOp(op) {
+  if (bootFailed) return;
+  pendingTabOps.push(op);
+  bootMonaco();
+}
+
+async function mountMonaco(m) {
+    const bootText = await loadInitialText();
     monaco = m;
+    // Index extensions once so languageFromPath is a single Map lookup
+    for (const lang of monaco.languages.getLanguages()) {
+        for (const ext of (lang.extensions || [])) {
+            const key = ext.toLowerCase();
+            if (!extToLang.has(key)) extToLang.set(key, lang.id);
+        }
+    }
     const el = document.getElementById('editor');
+    const fallback = document.getElementById('fallback-editor');
+    const text = fallback && fallbackEdited ? fallback.value : bootText;
+    // As line/column: textarea offsets count CRLF as one char, the model may not
+    const caret = fallback && fallback.selectionStart ? caretPosition(fallback.value, fallback.selectionStart) : null;
+    if (fallback) fallback.remove();
+    document.getElementById('tabs-container').innerHTML = '';
+
+    // Minimap, folding and highlight decorations cost a re-render per edit; opt in via --features
+    const features = !!BOOT.features;
     editor = monaco.editor.create(el, {
       model: null,
-      automaticLayout: true,
+      automaticLayout: false,
       readOnly: !!BOOT.readOnly,
-      minimap: { enabled: true },
+      minimap: { enabled: features && text.length <= LARGE_FILE_CHARS },
+      folding: features,
+      occurrencesHighlight: features ? 'singleFile' : 'off',
+      renderLineHighlight: features ? 'line' : 'none',
       lineNumbers: 'on'
     });
 
+    // Relayout only when the container actually changes size (automaticLayout polls every 100ms)
+    new ResizeObserver(() => editor.layout()).observe(el);
+    window.addEventListener('resize', () => editor.layout());
+
     editor.onDidChangeCursorPosition(e => {
         const statusCursor = document.getElementById('status-cursor');
         if (statusCursor) {
@@ -222,11 +393,21 @@ function bootMonaco() {
 
     if (BOOT.theme) monaco.editor.setTheme(BOOT.theme);
 
-    addTab(BOOT.path, BOOT.text);
+    // BOOT.lang is the forced (--lang) or extension-inferred language; an inferred plaintext defers to Monaco's own map
+    addTab(BOOT.path, text, BOOT.langForced || BOOT.lang !== 'plaintext' ? BOOT.lang : null);
 
     // Initial surgical replacement if passed via CLI args
     const tab = getActiveTab();
     if (tab) {
+        if (text !== bootText) {
+            // Edits typed into the fallback textarea carry over as unsaved changes,
+            // keeping the file's CRLF endings the textarea dropped
+            if (bootText.includes('\r\n')) tab.model.setEOL(monaco.editor.EndOfLineSequence.CRLF);
+            if (text !== bootText.replace(/\r\n?/g, '\n')) {
+                tab.isDirty = true;
+                updateTabVisuals();
+            }
+        }
         if (BOOT.replaceText != null && BOOT.sline && BOOT.eline) {
             const startColumn = BOOT.scol || 1;
             const endColumn = BOOT.ecol || tab.model.getLineMaxColumn(BOOT.eline);
@@ -241,15 +422,29 @@ function bootMonaco() {
             const range = new monaco.Range(BOOT.sline, 1, BOOT.eline, 1);
             editor.revealRangeInCenter(range, monaco.editor.ScrollType.Smooth);
             editor.setSelection(range);
+        } else if (caret) {
+            editor.setPosition(caret);
         }
     }
 
+    pendingTabOps.splice(0).forEach(op => op());
+}
+
+function caretPosition(value, offset) {
+    const before = value.slice(0, offset);
+    const lineStart = before.lastIndexOf('\n') + 1;
+    let lineNumber = 1;
+    for (let i = before.indexOf('\n'); i !== -1; i = before.indexOf('\n', i + 1)) lineNumber++;
+    return { lineNumber, column: offset - lineStart + 1 };
+}
+
+function wireUi() {
     document.addEventListener('keydown', (e) => {
         const ctrl = e.ctrlKey || e.metaKey;
         if (ctrl && (e.key === 's' || e.key === 'S')) { e.preventDefault(); doSave(); }
         if (ctrl && (e.key === 'o' || e.key === 'O')) { e.preventDefault(); doOpen(); }
         // Bind Ctrl+F to our custom modal
-        if (ctrl && (e.key === 'f' || e.key === 'F')) { e.preventDefault(); showFindReplace(); }
+        if (ctrl && (e.key === 'f' || e.key === 'F')) { e.preventDefault(); withEditor(showFindReplace); }
     }, true);
 
     // Expose Global Hooks
@@ -259,13 +454,18 @@ function bootMonaco() {
     window.__doSaveAs = doSaveAs;
     window.__doUndo = () => getActiveTab()?.model.undo();
     window.__doRedo = () => getActiveTab()?.model.redo();
-    window.__doCut = () => editor.getAction('editor.action.clipboardCutAction').run();
-    window.__doCopy = () => editor.getAction('editor.action.clipboardCopyAction').run();
-    window.__doPaste = () => editor.getAction('editor.action.clipboardPasteAction').run();
+    window.__doCut = () => editor?.getAction('editor.action.clipboardCutAction').run();
+    window.__doCopy = () => editor?.getAction('editor.action.clipboardCopyAction').run();
+    window.__doPaste = () => editor?.getAction('editor.action.clipboardPasteAction').run();
+    window.__toggleMinimap = () => {
+        if (!editor) return;
+        const enabled = editor.getOption(monaco.editor.EditorOption.minimap).enabled;
+        editor.updateOptions({ minimap: { enabled: !enabled } });
+    };
     
     // THE FIX: Point to our new function!
-    window.__showFindReplace = showFindReplace;
-    window.__showSurgicalReplace = showSurgicalReplace;
+    window.__showFindReplace = () => withEditor(showFindReplace);
+    window.__showSurgicalReplace = () => withEditor(showSurgicalReplace);
 
     // Event Listeners for Surgical
     document.getElementById('surg-apply').addEventListener('click', applySurgicalReplace);
@@ -295,43 +495,83 @@ function bootMonaco() {
             }
         }
     });
-  });
 }
 
 // --- Tab Helper Functions ---
-const getTab = (tabId) => tabs.find(t => t.id === tabId);
+const basename = (p) => {
+    const i = Math.max(p.lastIndexOf('/'), p.lastIndexOf('\\'));
+    return i < 0 ? p : p.slice(i + 1);
+};
+const getTab = (tabId) => tabById.get(tabId);
 const getActiveTab = () => getTab(activeTabId);
 const languageFromPath = (p) => {
     if (!p || !monaco) return 'plaintext';
-    const ext = '.' + p.split('.').pop();
-    const langs = monaco.languages.getLanguages();
-    const hit = langs.find(l => Array.isArray(l.extensions) && l.extensions.includes(ext));
-    return hit ? hit.id : 'plaintext';
-}
-
-function renderTabs() {
-    const container = document.getElementById('tabs-container');
-    container.innerHTML = '';
-    tabs.forEach(tab => {
-        const tabEl = document.createElement('div');
-        tabEl.className = 'tab' + (tab.id === activeTabId ? ' active' : '');
-        tabEl.onclick = () => switchTab(tab.id);
-        const name = tab.path ? tab.path.split(/[\\/]/).pop() : 'Untitled';
-        const closeIcon = tab.isDirty ? '●' : '&times;';
-        tabEl.innerHTML = `<span>${name}</span><span class="tab-close" onclick="closeTab(event, ${tab.id})">${closeIcon}</span>`;
-        container.appendChild(tabEl);
+    const i = p.lastIndexOf('.');
+    if (i < 0) return 'plaintext';
+    return extToLang.get(p.slice(i).toLowerCase()) || 'plaintext';
+}
+
+// Tab elements are created once per tab and patched in place afterwards
+function createTabEl(tab) {
+    const tabEl = document.createElement('div');
+    tabEl.className = 'tab';
+    tabEl.onclick = () => switchTab(tab.id);
+    tabEl.innerHTML = `<span class="tab-name"></span><span class="tab-close"></span>`;
+    tabEl.querySelector('.tab-close').onclick = (event) => closeTab(event, tab.id);
+    document.getElementById('tabs-container').appendChild(tabEl);
+    tabEls.set(tab.id, tabEl);
+}
+
+function paintTab(tab) {
+    const tabEl = tabEls.get(tab.id);
+    if (!tabEl) return;
+    tabEl.classList.toggle('active', tab.id === activeTabId);
+    tabEl.querySelector('.tab-name').textContent = tab.path ? basename(tab.path) : 'Untitled';
+    tabEl.querySelector('.tab-close').textContent = tab.isDirty ? '●' : '\u00d7';
+}
+
+// The window title lives on the Python side; coalesce bridge calls to one per
+// frame and skip them when nothing the title depends on has changed.
+function scheduleTitleSync() {
+    if (titleSyncPending) return;
+    titleSyncPending = true;
+    requestAnimationFrame(() => {
+        titleSyncPending = false;
+        const activeTab = getActiveTab();
+        const path = activeTab?.path || null;
+        const isDirty = activeTab?.isDirty || false;
+        if (path === lastTitleSync.path && isDirty === lastTitleSync.isDirty) return;
+        if (window.pywebview && window.pywebview.api && window.pywebview.api.set_active_tab) {
+            lastTitleSync = { path, isDirty };
+            window.pywebview.api.set_active_tab(path, isDirty);
+        }
     });
+}
+
+function syncActiveTab() {
     const activeTab = getActiveTab();
-    if (window.pywebview && window.pywebview.api && window.pywebview.api.set_active_tab) {
-         window.pywebview.api.set_active_tab(activeTab?.path || null, activeTab?.isDirty || false);
-    }
+    scheduleTitleSync();
     const statusFilepath = document.getElementById('status-filepath');
     if (statusFilepath) {
         statusFilepath.textContent = activeTab?.path || '[Untitled]';
     }
 }
 
+// addTab -> switchTab -> updateTabVisuals is often followed by another call from
+// the caller; coalesce those into a single repaint at the end of the current task.
+function updateTabVisuals() {
+    if (!monaco) { queueTabOp(updateTabVisuals); return; }
+    if (tabVisualsPending) return;
+    tabVisualsPending = true;
+    queueMicrotask(() => {
+        tabVisualsPending = false;
+        tabs.forEach(paintTab);
+        syncActiveTab();
+    });
+}
+
 function switchTab(tabId) {
+    if (!monaco) { queueTabOp(() => switchTab(tabId)); return; }
     if (activeTabId === tabId) return;
     const currentTab = getActiveTab();
     if (currentTab) {
@@ -344,29 +584,69 @@ function switchTab(tabId) {
         editor.restoreViewState(newTab.viewState);
     }
     editor.focus();
-    renderTabs();
+    updateTabVisuals();
+}
+
+// Closed files keep their tokenized model around (LRU) so reopening is cheap
+function dropCachedModel(path) {
+    const hit = modelCache.get(path);
+    if (!hit) return;
+    modelCache.delete(path);
+    hit.model.dispose();
+}
+
+function cacheModel(tab) {
+    const prev = modelCache.get(tab.path);
+    modelCache.delete(tab.path);
+    if (prev && prev.model !== tab.model) prev.model.dispose();
+    modelCache.set(tab.path, { model: tab.model, viewState: tab.viewState });
+    if (modelCache.size > MODEL_CACHE_SIZE) {
+        const [oldestPath, oldest] = modelCache.entries().next().value;
+        oldest.model.dispose();
+        modelCache.delete(oldestPath);
+    }
+}
+
+function takeCachedModel(path, text) {
+    const hit = path ? modelCache.get(path) : null;
+    if (!hit) return null;
+    modelCache.delete(path);
+    // Only reuse it if the file still matches what the model holds
+    if (hit.model.getValueLength() === text.length && hit.model.getValue() === text) return hit;
+    hit.model.dispose();
+    return null;
 }
 
-function addTab(path, text) {
-    const existing = path ? tabs.find(t => t.path === path) : null;
+function addTab(path, text, lang) {
+    if (!monaco) { queueTabOp(() => addTab(path, text, lang)); return; }
+    const existing = path ? tabByPath.get(path) : null;
     if (existing) {
         switchTab(existing.id);
         return;
     }
+    const cached = takeCachedModel(path, text);
     const newTab = {
         id: nextTabId++,
         path: path,
-        model: monaco.editor.createModel(text, languageFromPath(path)),
-        viewState: null,
+        model: cached ? cached.model : monaco.editor.createModel(text, lang || languageFromPath(path)),
+        viewState: cached ? cached.viewState : null,
         isDirty: false
     };
-    newTab.model.onDidChangeContent(() => {
-        if (!newTab.isDirty) {
-            newTab.isDirty = true;
-            renderTabs();
-        }
+    newTab.contentListener = newTab.model.onDidChangeContent(() => {
+        // Only the first edit after a load/save changes anything visible
+        if (newTab.isDirty) return;
+        newTab.isDirty = true;
+        paintTab(newTab);
+        if (newTab.id === activeTabId) syncActiveTab();
     });
+    if (text.length > LARGE_FILE_CHARS) {
+        // The minimap re-renders the whole buffer at reduced scale; never worth it for big files
+        editor.updateOptions({ minimap: { enabled: false } });
+    }
     tabs.push(newTab);
+    tabById.set(newTab.id, newTab);
+    if (path) tabByPath.set(path, newTab);
+    createTabEl(newTab);
     switchTab(newTab.id);
 }
 
@@ -387,7 +667,17 @@ async function closeTab(event, tabId) {
     }
 
     const [removedTab] = tabs.splice(tabIdx, 1);
-    removedTab.model.dispose();
+    tabById.delete(tabId);
+    if (removedTab.path && tabByPath.get(removedTab.path) === removedTab) tabByPath.delete(removedTab.path);
+    removedTab.contentListener.dispose();
+    if (removedTab.path && !removedTab.isDirty) {
+        if (tabId === activeTabId) removedTab.viewState = editor.saveViewState();
+        cacheModel(removedTab);
+    } else {
+        removedTab.model.dispose();
+    }
+    tabEls.get(tabId)?.remove();
+    tabEls.delete(tabId);
     if (activeTabId === tabId) {
         const newActiveIdx = Math.max(0, tabIdx - 1);
         const newActiveTab = tabs.length > 0 ? tabs[newActiveIdx] : null;
@@ -397,47 +687,134 @@ async function closeTab(event, tabId) {
     if (tabs.length === 0) {
         addTab(null, '');
     } else {
-        renderTabs();
+        updateTabVisuals();
     }
 }
 
 // --- File Operations ---
+function setTabPath(tab, path) {
+    if (tab.path && tabByPath.get(tab.path) === tab) tabByPath.delete(tab.path);
+    tab.path = path;
+    tabByPath.set(path, tab);
+    // Whatever was cached for this path no longer matches the file just written there
+    dropCachedModel(path);
+}
+
+// setModelLanguage re-tokenizes the whole buffer, so only call it when the language changes
+function setTabLanguage(tab) {
+    const lang = languageFromPath(tab.path);
+    if (tab.model.getLanguageId() !== lang) monaco.editor.setModelLanguage(tab.model, lang);
+}
+
 async function doOpen() {
     if (!(window.pywebview && window.pywebview.api && window.pywebview.api.open_dialog)) return;
     const res = await window.pywebview.api.open_dialog();
-    if (res && res.path != null && typeof res.text === 'string') {
-        addTab(res.path, res.text);
+    if (!res || res.path == null || !res.token) return;
+    const r = await fetchFile(res.token);
+    if (!r.ok) {
+        window.pywebview.api.create_alert('File Open Error', `Failed to read file:\n${res.path}\n\n${r.status} ${r.statusText}`);
+        return;
+    }
+    addTab(res.path, await readFileBody(r));
+}
+
+// Small buffers go over the bridge in one call; large ones are streamed in
+// line-aligned chunks so no single JSON message carries the whole file.
+async function writeTab(tab, forceDialog) {
+    const api = window.pywebview.api;
+    const model = tab.model;
+    if (model.getValueLength() <= SAVE_CHUNK_CHARS) {
+        const content = model.getValue();
+        return forceDialog ? api.save_as_dialog(content, tab.path) : api.save_dialog(content, tab.path);
     }
+    const target = await api.begin_save(tab.path, forceDialog);
+    if (!target || target.handle == null) return target;
+
+    // Keep the buffer stable while chunks are in flight
+    editor.updateOptions({ readOnly: true });
+    const total = model.getValueLength();
+    let ok = false;
+    try {
+        // Cut by character offset so one long (e.g. minified) line can't make a huge message
+        for (let start = 0; start < total;) {
+            const from = model.getPositionAt(start);
+            let to = model.getPositionAt(Math.min(start + SAVE_CHUNK_CHARS, total));
+            let chunk = model.getValueInRange(monaco.Range.fromPositions(from, to));
+            const lastCode = chunk.charCodeAt(chunk.length - 1);
+            if (lastCode >= 0xD800 && lastCode <= 0xDBFF && to.column > 1) {
+                // Never split a surrogate pair: a lone half can't be encoded on the Python side
+                to = new monaco.Position(to.lineNumber, to.column - 1);
+                chunk = chunk.slice(0, -1);
+            }
+            await api.write_chunk(target.handle, chunk);
+            // Resume from where this chunk really ended (an offset inside a CRLF maps to before it)
+            start = model.getOffsetAt(to);
+        }
+        ok = true;
+    } catch (e) {
+        console.error('[save] chunked write failed', e);
+    } finally {
+        editor.updateOptions({ readOnly: !!BOOT.readOnly });
+    }
+    return api.end_save(target.handle, ok);
 }
 
 async function doSave() {
+    if (!monaco) { queueTabOp(doSave); return; }
     const tab = getActiveTab();
     if (!tab) return;
-    const res = await window.pywebview.api.save_dialog(tab.model.getValue(), tab.path);
+    const res = await writeTab(tab, false);
     if (res && res.saved && res.path) {
-       tab.path = res.path;
+       const moved = res.path !== tab.path;
+       setTabPath(tab, res.path);
        tab.isDirty = false;
-       monaco.editor.setModelLanguage(tab.model, languageFromPath(tab.path));
-       renderTabs();
+       if (moved) setTabLanguage(tab);
+       updateTabVisuals();
     }
 }
 
 async function doSaveAs() {
+    if (!monaco) { queueTabOp(doSaveAs); return; }
     const tab = getActiveTab();
     if (!tab) return;
-    const res = await window.pywebview.api.save_as_dialog(tab.model.getValue(), tab.path);
+    const res = await writeTab(tab, true);
     if (res && res.saved && res.path) {
-        tab.path = res.path;
+        const moved = res.path !== tab.path;
+        setTabPath(tab, res.path);
         tab.isDirty = false;
-        monaco.editor.setModelLanguage(tab.model, languageFromPath(tab.path));
-        renderTabs();
+        if (moved) setTabLanguage(tab);
+        updateTabVisuals();
     }
 }
 
 // --- Boot sequence ---
-(function(){
-  var s = document.createElement('script');
-  s.src = 'https://cdn.jsdelivr.net/npm/monaco-editor@0.45.0/min/vs/loader.js';
-  s.onload = () => document.readyState === 'loading' ? document.addEventListener('DOMContentLoaded', bootMonaco) : bootMonaco();
-  document.head.appendChild(s);
-})();
\ No newline at end of file
+async function startup() {
+  mountFallback();
+  wireUi();
+  const el = document.getElementById('editor');
+  el.addEventListener('focusin', bootMonaco, { once: true });
+  el.addEventListener('click', bootMonaco, { once: true });
+  await loadBoot();
+  labelFallback();
+  if (BOOT.sline && BOOT.eline) {
+    // CLI-driven selections and surgical replacements need Monaco right away
+    bootMonaco();
+  }
+  loadInitialText().catch(e => { failBoot(e); return ''; }).then(text => {
+    const fallback = document.getElementById('fallback-editor');
+    const large = text.length > LARGE_FILE_CHARS;
+    if (fallback) {
+      // A multi-MB value would cost the textarea as much as Monaco; show a read-only head instead
+      fallback.value = large ? text.slice(0, FALLBACK_PREVIEW_CHARS) : text;
+      fallback.readOnly = bootFailed || large || !!BOOT.readOnly;
+      fallback.placeholder = '';
+    }
+    if (large) {
+      bootMonaco();
+    } else if (text && !editorPromise) {
+      if ('requestIdleCallback' in window) requestIdleCallback(() => bootMonaco());
+      else setTimeout(bootMonaco, 200);
+    }
+  });
+}
+document.readyState === 'loading' ? document.addEventListener('DOMContentLoaded', startup) : startup();
@@ -1,9 +1,16 @@
+from __future__ import annotations
+
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 import argparse
-import json
-import base64
-import html
+import filecmp
+import functools
+import gzip
+import itertools
+import mmap
+import secrets
+import stat
 import contextlib
 import re
 import tkinter as tk # Kept for contract compliance, though primary GUI is pywebview
@@ -13,45 +20,49 @@ import tkinter as tk # Kept for contract compliance, though primary GUI is pyweb
 os.environ['PYWEBVIEW_GUI'] = 'qt'
 os.environ.setdefault('PYWEBVIEW_LOG', 'info')
 
-try:
-    import qtpy
-    from PySide6 import QtCore
-    from PySide6.QtGui import QIcon
-except ImportError as e:
-    print(f"[fatal] Qt backend not available. Install: pip install qtpy PySide6\n{e}", file=sys.stderr)
-    sys.exit(1)
+def require_gui_backend():
+    """Imports the Qt/pywebview stack on first GUI launch so headless runs never load it."""
+    try:
+        import qtpy
+        from PySide6 import QtCore
+    except ImportError as e:
+        print(f"[fatal] Qt backend not available. Install: pip install qtpy PySide6\n{e}", file=sys.stderr)
+        sys.exit(1)
 
-try:
-    import webview
-    from webview import FileDialog
-    from webview.menu import Menu, MenuAction, MenuSeparator
-except ImportError as e:
-    print(f"[fatal] pywebview not available. Install: pip install pywebview\n{e}", file=sys.stderr)
-    sys.exit(1)
+    try:
+        import bottle
+        import webview
+    except ImportError as e:
+        print(f"[fatal] pywebview not available. Install: pip install pywebview\n{e}", file=sys.stderr)
+        sys.exit(1)
 
 # --- LOG FILTERING (From legacy start_app.py) ---
+# Harmless Mesa/Chromium GPU noise, fused into one alternation so each write is a single search
+_LOG_NOISE_RE = re.compile('|'.join([
+    r"MESA-LOADER: failed to open i965",
+    r"failed to load driver: i965",
+    r"Buffer handle is null",
+    r"Creation of StagingBuffer's SharedImage failed",
+    r"shared_image_interface_proxy\.cc",
+    r"one_copy_raster_buffer_provider\.cc",
+]))
+# Both rewrites done in a single pass over the line
+_LOG_REWRITE_RE = re.compile(r'ERROR|failed')
+_LOG_REWRITES = {'ERROR': 'WARNING (safe to ignore)', 'failed': 'note: failed'}
+
+def _log_rewrite(match):
+    return _LOG_REWRITES[match.group(0)]
+
 def apply_log_filter():
     """Suppress harmless Mesa/Qt warnings often seen on Linux."""
-    error_patterns = [
-        re.compile(r"MESA-LOADER: failed to open i965"),
-        re.compile(r"failed to load driver: i965"),
-        re.compile(r"Buffer handle is null"),
-        re.compile(r"Creation of StagingBuffer's SharedImage failed"),
-        re.compile(r"shared_image_interface_proxy.cc"),
-        re.compile(r"one_copy_raster_buffer_provider.cc"),
-    ]
-
     class LogFilter:
         def __init__(self, stream):
             self.stream = stream
         def write(self, data):
-            modified = data
-            for pattern in error_patterns:
-                if pattern.search(data):
-                    modified = data.replace("ERROR", "WARNING (safe to ignore)")
-                    modified = modified.replace("failed", "note: failed")
-                    break
-            self.stream.write(modified)
+            # The rewrite only touches "ERROR"/"failed"; without either there is nothing to do
+            if ('ERROR' in data or 'failed' in data) and _LOG_NOISE_RE.search(data):
+                data = _LOG_REWRITE_RE.sub(_log_rewrite, data)
+            self.stream.write(data)
         def flush(self):
             self.stream.flush()
 
@@ -60,20 +71,130 @@ def apply_log_filter():
 
 # --- CORE LOGIC & HELPERS ---
 
-def b64(s: str) -> str:
-    """Encodes a string into Base64 for safe embedding in HTML."""
-    return base64.b64encode(s.encode('utf-8')).decode('ascii')
+@contextlib.contextmanager
+def silence_native_stderr():
+    """Points fd 2 at devnull; Qt/Chromium write there directly, bypassing sys.stderr."""
+    try:
+        sys.stderr.flush()
+        saved_fd = os.dup(2)
+    except (OSError, ValueError):
+        # No usable fd 2 (e.g. pythonw); nothing to silence
+        yield
+        return
+    devnull_fd = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull_fd, 2)
+    try:
+        yield
+    finally:
+        os.dup2(saved_fd, 2)
+        os.close(saved_fd)
+        os.close(devnull_fd)
+
+MONACO_CDN = 'https://cdn.jsdelivr.net/npm/monaco-editor@0.45.0/min/vs'
 
-def load_text(path: str | None) -> str:
-    """Safely loads text from a file path."""
-    if not path:
-        return ''
+def read_file_bytes(path: str) -> bytes:
+    """Reads a whole file with a single fstat-sized read, bypassing the buffered IO stack."""
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
     try:
-        with open(path, 'r', encoding='utf-8', errors='replace') as f:
-            return f.read()
-    except Exception as e:
-        print(f"[error] Failed to read file: {path}\n{e}", file=sys.stderr)
-        return f"<unable to read {html.escape(str(path))}>"
+        size = os.fstat(fd).st_size
+        if size:
+            chunks = [os.read(fd, size)]
+            # A single read can come up short (file grew, or the OS caps the request)
+            while chunk := os.read(fd, 262144):
+                chunks.append(chunk)
+            return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+    finally:
+        os.close(fd)
+    # /proc-like files report st_size == 0; read them through a large buffer instead
+    with open(path, 'rb', buffering=262144) as f:
+        return f.read()
+
+_MMAP_THRESHOLD = 1 << 20
+
+def read_file_text(path: str, errors: str = 'replace') -> str:
+    """Reads and decodes a whole file; large files decode straight out of an mmap of the page cache."""
+    if os.stat(path).st_size > _MMAP_THRESHOLD:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # str() reads the mapping through the buffer protocol: no intermediate bytes copy
+            return str(mm, 'utf-8', errors)
+    return read_file_bytes(path).decode('utf-8', errors)
+
+def tmp_path_for(path: str) -> str:
+    """Sibling temp name for an atomic save; the pid keeps concurrent instances apart."""
+    return f'{path}.tmp-{os.getpid()}'
+
+def open_save_target(path: str, mode: str, **kwargs):
+    """Opens the file a save of path writes to; returns (file, target).
+
+    The temp file sits beside the real target, so symlinks keep pointing at the saved file.
+    Hard-linked files, and directories that refuse the temp file, are written in place
+    instead (file.name == target).
+    """
+    target = os.path.realpath(path)
+    try:
+        in_place = os.stat(target).st_nlink > 1
+    except OSError:
+        in_place = False
+    if not in_place:
+        try:
+            return open(tmp_path_for(target), mode, **kwargs), target
+        except OSError:
+            pass
+    return open(target, mode, **kwargs), target
+
+def replace_from_tmp(tmp: str, target: str):
+    """Moves a finished temp file over target, keeping its permission bits and, where allowed, its owner."""
+    if tmp == target:
+        # Written in place; nothing to swap
+        return
+    try:
+        st = os.stat(target)
+    except FileNotFoundError:
+        pass
+    else:
+        os.chmod(tmp, stat.S_IMODE(st.st_mode))
+        if hasattr(os, 'chown'):
+            # Only permitted for root or a matching owner/group; otherwise the saver's ownership stands
+            with contextlib.suppress(OSError):
+                os.chown(tmp, st.st_uid, st.st_gid)
+    os.replace(tmp, target)
+
+def replace_if_changed(tmp: str, target: str):
+    """replace_from_tmp, unless target already holds the same bytes; then the temp file is dropped."""
+    if tmp != target:
+        try:
+            # Sizes are compared before any data is read
+            unchanged = filecmp.cmp(tmp, target, shallow=False)
+        except OSError:
+            unchanged = False
+        if unchanged:
+            os.unlink(tmp)
+            return
+    replace_from_tmp(tmp, target)
+
+def write_text_atomic(path: str, content: str):
+    """Writes content to a sibling temp file, then swaps it into place; a no-op if the file already matches."""
+    # Encoded once, written in binary so Monaco's own line endings go out as-is. Buffered:
+    # a raw FileIO.write may stop short (ENOSPC, RLIMIT_FSIZE, >2 GiB) without raising
+    data = content.encode('utf-8')
+    try:
+        if os.path.getsize(path) == len(data) and read_file_bytes(path) == data:
+            # Autosave of unchanged text: skip the rewrite and the rename
+            return
+    except OSError:
+        pass
+    f, target = open_save_target(path, 'wb')
+    try:
+        with f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_from_tmp(f.name, target)
+    except BaseException:
+        if f.name != target:
+            with contextlib.suppress(OSError):
+                os.unlink(f.name)
+        raise
 
 def get_asset_path(filename: str) -> str:
     """Resolves path to the assets directory relative to this script."""
@@ -81,19 +202,78 @@ def get_asset_path(filename: str) -> str:
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_dir, 'assets', filename)
 
-def load_and_combine_ui() -> str:
-    """Reads UI files from assets/ and combines them."""
+@functools.lru_cache(maxsize=1)
+def load_and_combine_ui() -> tuple[str, str, str]:
+    """Reads the UI files from assets/: (html_template, css_text, js_text)."""
+    def read_asset(name):
+        with open(get_asset_path(name), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    # Issue the three reads together so a cold cache costs the slowest read, not the sum
     try:
-        with open(get_asset_path('index.html'), 'r', encoding='utf-8') as f:
-            html_template = f.read()
-        with open(get_asset_path('style.css'), 'r', encoding='utf-8') as f:
-            css_text = f.read()
-        with open(get_asset_path('index.js'), 'r', encoding='utf-8') as f:
-            js_text = f.read()
+        with ThreadPoolExecutor(max_workers=3) as ex:
+            futures = [ex.submit(read_asset, name) for name in ('index.html', 'style.css', 'index.js')]
+            html_template, css_text, js_text = [f.result() for f in futures]
     except FileNotFoundError as e:
         print(f"[fatal] UI file not found: {e}. Ensure assets are in the 'assets/' directory.", file=sys.stderr)
         sys.exit(1)
-    return html_template.replace('%CSS%', css_text).replace('%JS%', js_text)
+    return html_template, css_text, js_text
+
+_TPL_RE = re.compile(r'%(CSS|JS)%')
+
+@functools.lru_cache(maxsize=1)
+def render_ui() -> str:
+    """Returns the combined UI page, built once per process; boot data comes from Api.get_boot_data."""
+    html_template, css_text, js_text = load_and_combine_ui()
+    # One walk over the template, substituting each slot as it is reached
+    subs = {'CSS': css_text, 'JS': js_text}
+    return ''.join(subs[part] if i % 2 else part for i, part in enumerate(_TPL_RE.split(html_template)))
+
+def make_ui_app(final_html: str, vs_dir: str | None, claim_file) -> bottle.Bottle:
+    """Builds the local WSGI app that serves the editor page and, if present, the Monaco 'vs' tree."""
+    import bottle
+    app = bottle.Bottle()
+    # The page (CSS/JS inlined) is fixed for the app's lifetime, so compress it once up front
+    page_gz = gzip.compress(final_html.encode('utf-8'), compresslevel=6, mtime=0)
+
+    @app.route('/')
+    def index():
+        bottle.response.set_header('Vary', 'Accept-Encoding')
+        if 'gzip' in bottle.request.get_header('Accept-Encoding', ''):
+            bottle.response.set_header('Content-Encoding', 'gzip')
+            return page_gz
+        return final_html
+
+    @app.route('/file')
+    def file_contents():
+        # One-shot token -> path handed out by Api._issue_file_token; the browser streams and
+        # decodes the body itself instead of receiving it as one JSON string over the bridge
+        path = claim_file(bottle.request.query.token)
+        if not path:
+            # 410, not 404: the frontend reads 404 as "file doesn't exist yet"
+            bottle.abort(410, 'Unknown or already used file token.')
+        response = bottle.static_file(os.path.basename(path), root=os.path.dirname(path),
+                                      mimetype='text/plain', charset='utf-8')
+        response.set_header('Cache-Control', 'no-store')
+        return response
+
+    if vs_dir:
+        @app.route('/vs/<filepath:path>')
+        def monaco_assets(filepath):
+            # The bundle never changes while the app runs, so let the engine's disk cache keep it
+            response = bottle.static_file(filepath, root=vs_dir)
+            response.set_header('Cache-Control', 'public, max-age=31536000, immutable')
+            return response
+
+    return app
+
+@functools.lru_cache(maxsize=1)
+def load_icon(icon_path: str) -> QIcon:
+    """Builds the window icon from the PNG's bytes, read and decoded once per process."""
+    from PySide6.QtGui import QIcon, QPixmap
+    pixmap = QPixmap()
+    pixmap.loadFromData(read_file_bytes(icon_path), 'PNG')
+    return QIcon(pixmap)
 
 class Api:
     """The API class exposed to the JavaScript frontend."""
@@ -101,7 +281,13 @@ class Api:
         self.window: webview.Window | None = None
         self._active_path: str | None = None
         self._active_is_dirty: bool = False
+        self._last_title_key: tuple | None = None
         self._boot: dict | None = None
+        self._save_handles = itertools.count(1)
+        self._open_saves: dict = {}
+        self._file_tokens: dict[str, str] = {}
+        # Large reads/writes run here so their allocations don't stall the bridge thread
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='monaco-io')
 
     def get_boot_data(self) -> dict:
         return self._boot or {}
@@ -116,23 +302,28 @@ class Api:
         return False
 
     def set_active_tab(self, path: str | None, is_dirty: bool):
-        self._active_path = path
+        # Bridge strings arrive as fresh objects; interned, the title-key compare is an identity check
+        self._active_path = sys.intern(path) if path else None
         self._active_is_dirty = is_dirty
         self._update_title()
 
     def open_dialog(self) -> dict:
         assert self.window is not None
+        from webview import FileDialog
         result = self.window.create_file_dialog(FileDialog.OPEN, allow_multiple=False, file_types=("All files (*.*)",))
         if not result or not isinstance(result, (list, tuple)) or not result[0]:
             return {'cancelled': True}
         path = result[0]
-        try:
-            with open(path, 'r', encoding='utf-8', errors='replace') as f:
-                text = f.read()
-            return {'cancelled': False, 'path': path, 'text': text}
-        except Exception as e:
-            self.window.create_alert('File Open Error', f'Failed to read file:\n{path}\n\n{e}')
-            return {'cancelled': True}
+        return {'cancelled': False, 'path': path, 'token': self._issue_file_token(path)}
+
+    def _issue_file_token(self, path: str) -> str:
+        # Redeemed once by the /file route (see make_ui_app)
+        token = secrets.token_urlsafe(16)
+        self._file_tokens[token] = path
+        return token
+
+    def _claim_file(self, token: str) -> str | None:
+        return self._file_tokens.pop(token, None)
 
     def save_dialog(self, content: str, path: str | None) -> dict:
         return self._save_logic(content, path, force_dialog=False)
@@ -140,26 +331,71 @@ class Api:
     def save_as_dialog(self, content: str, path: str | None) -> dict:
         return self._save_logic(content, path, force_dialog=True)
 
-    def _save_logic(self, content: str, path: str | None, force_dialog: bool) -> dict:
+    # Large buffers are streamed in bounded chunks instead of one giant bridge message:
+    # begin_save -> write_chunk (repeated) -> end_save.
+    def begin_save(self, path: str | None, force_dialog: bool = False) -> dict:
         assert self.window is not None
+        path = self._resolve_save_path(path, force_dialog)
+        if not path:
+            return {'saved': False}
+        try:
+            f, target = open_save_target(path, 'w', encoding='utf-8', newline='', buffering=262144)
+        except Exception as e:
+            self.window.create_alert('Save Error', f'Failed to save to {path}\n{e}')
+            return {'saved': False, 'error': str(e)}
+        handle = next(self._save_handles)
+        self._open_saves[handle] = (f, path, target)
+        return {'handle': handle, 'path': path}
+
+    def write_chunk(self, handle: int, data: str):
+        self._open_saves[handle][0].write(data)
+
+    def end_save(self, handle: int, ok: bool = True) -> dict:
+        assert self.window is not None
+        f, path, target = self._open_saves.pop(handle)
+        error = None
+        try:
+            try:
+                if ok:
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                f.close()
+            if ok:
+                self._io_pool.submit(replace_if_changed, f.name, target).result()
+        except Exception as e:
+            error = e
+        if not ok or error:
+            if f.name != target:
+                with contextlib.suppress(OSError):
+                    os.unlink(f.name)
+            self.window.create_alert('Save Error', f'Failed to save to {path}\n{error or "write interrupted"}')
+            return {'saved': False, 'error': str(error or 'write interrupted')}
+        return {'saved': True, 'path': path}
+
+    def _resolve_save_path(self, path: str | None, force_dialog: bool) -> str | None:
         if not path or force_dialog:
+            from webview import FileDialog
+            directory, save_filename = os.path.split(path) if path else ('', 'untitled.txt')
             result = self.window.create_file_dialog(
                 FileDialog.SAVE,
-                directory=os.path.dirname(path) if path else '',
-                save_filename=os.path.basename(path) if path else 'untitled.txt',
+                directory=directory,
+                save_filename=save_filename,
                 file_types=("All files (*.*)",)
             )
             if not result:
-                return {'saved': False}
+                return None
             path = result[0] if isinstance(result, (tuple, list)) and len(result) > 0 else result
+        return path or None
 
+    def _save_logic(self, content: str, path: str | None, force_dialog: bool) -> dict:
+        assert self.window is not None
+        path = self._resolve_save_path(path, force_dialog)
         if not path:
              return {'saved': False}
 
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            self.set_active_tab(path, is_dirty=False)
+            self._io_pool.submit(write_text_atomic, path, content).result()
             return {'saved': True, 'path': path}
         except Exception as e:
             self.window.create_alert('Save Error', f'Failed to save to {path}\n{e}')
@@ -172,10 +408,12 @@ class Api:
     def _update_title(self):
         if not self.window:
             return
+        # set_title is a cross-thread Qt call; skip it when nothing visible changed
+        key = (self._active_path, self._active_is_dirty)
+        if key == self._last_title_key:
+            return
+        self._last_title_key = key
         base = os.path.basename(self._active_path) if self._active_path else 'Untitled'
-        # Hide NamedTemporaryFile suffixes
-        if base.lower().startswith("untitled-") and base.lower().endswith(".txt"):
-            base = "Untitled"
         dirty_indicator = '●' if self._active_is_dirty else ''
         self.window.set_title(f"{base}{dirty_indicator} - Monaco Viewer")
 
@@ -183,29 +421,49 @@ class Api:
 
 def run_gui(file=None, sline=None, eline=None, scol=None, ecol=None,
             replace_text=None, autosave=False, theme='vs-dark',
-            lang=None, read_only=False):
+            lang=None, read_only=False, cdn=False, features=False, base=None,
+            is_untitled=False, lang_forced=False):
     """Launches the PyWebView GUI."""
-    
-    # Path handling
-    path = os.path.abspath(file) if file else None
-    text = load_text(path)
-    base = os.path.basename(path) if path else ""
-    is_untitled = (not base) or (base.lower().startswith("untitled-") and base.lower().endswith(".txt"))
+    require_gui_backend()
+    import webview
+    from webview.menu import Menu, MenuAction, MenuSeparator
+
+    # Monaco source: local assets/vs tree unless --cdn was requested or it isn't installed
+    vs_dir = get_asset_path('vs')
+    if cdn or not os.path.isdir(vs_dir):
+        if not cdn:
+            print("[info] assets/vs not found, loading Monaco from the CDN.", file=sys.stderr)
+        vs_dir = None
+
+    # Path handling; callers that already split the path pass it absolute along with its base
+    path = file or None
+    if base is None:
+        path = os.path.abspath(path) if path else None
+        base = os.path.split(path)[1] if path else ""
+    if path:
+        path = sys.intern(path)
+    # Untitled buffers live in memory only; the first save asks where to put them
+    is_untitled = is_untitled or not path
     display_name = "Untitled" if is_untitled else base
 
     # Prepare Boot Data
     boot = {
-        'text': text, 'path': path, 'sline': sline, 'eline': eline, 'scol': scol, 'ecol': ecol,
+        'path': path, 'sline': sline, 'eline': eline, 'scol': scol, 'ecol': ecol,
         'replaceText': replace_text, 'autosave': autosave, 'theme': theme, 'lang': lang,
+        'langForced': lang_forced,
         'readOnly': read_only, 'displayName': display_name, 'isUntitled': is_untitled,
+        'features': features,
+        'vsPath': './vs' if vs_dir else MONACO_CDN,
     }
     
     api = Api()
+    # The boot file loads through /file like any opened file; a missing path just 404s to an empty buffer
+    boot['fileToken'] = api._issue_file_token(path) if path else None
     api._boot = boot
     
-    # Inject Boot Data into HTML
+    # Boot data stays on the Python side; JS fetches it via get_boot_data
     try:
-        final_html = load_and_combine_ui().replace('%BOOT%', b64(json.dumps(boot)))
+        final_html = render_ui()
     except Exception as e:
         print(f"Error preparing UI: {e}")
         return
@@ -231,53 +489,239 @@ def run_gui(file=None, sline=None, eline=None, scol=None, ecol=None,
             MenuAction('Find / Replace', lambda: api.window.evaluate_js('window.__showFindReplace()')),
             MenuSeparator(),
             MenuAction('Agent Surgical Replace...', lambda: api.window.evaluate_js('window.__showSurgicalReplace()'))
+        ]),
+        Menu('View', [
+            MenuAction('Toggle Minimap', lambda: api.window.evaluate_js('window.__toggleMinimap()'))
         ])
     ]
 
     win = webview.create_window(
-        title="Monaco Viewer", html=final_html, width=1100, height=750,
+        title="Monaco Viewer", url=make_ui_app(final_html, vs_dir, api._claim_file), width=1100, height=750,
         js_api=api, confirm_close=True, menu=menu_items
     )
     api.window = win
 
     def set_icon():
-        icon_path = get_asset_path('monaco-viewer-icon.png')
+        icon_path = get_asset_path(os.path.join('icons', 'monaco-viewer-icon.png'))
         if webview.windows and hasattr(webview.windows[0], 'gui_window'):
             native_win = webview.windows[0].gui_window
             if native_win and os.path.exists(icon_path):
                 try:
-                    native_win.setWindowIcon(QIcon(icon_path))
+                    native_win.setWindowIcon(load_icon(icon_path))
                 except Exception:
                     pass
 
-    # Suppress output during launch
-    with open(os.devnull, 'w') as f, contextlib.redirect_stderr(f):
+    # Native Qt/Chromium noise bypasses the LogFilter; hiding it also hides Python
+    # tracebacks on fd 2, so it is opt-in
+    quiet = os.environ.get('MONACO_VIEWER_QUIET') == '1'
+    with silence_native_stderr() if quiet else contextlib.nullcontext():
         webview.start(set_icon, gui='qt', debug=False)
 
 # --- CLI MODE (Utility) ---
 
+_PARSER = argparse.ArgumentParser(description='Monaco Viewer - Code Editor & Utility')
+
+# GUI Arguments
+_PARSER.add_argument('--file', nargs='?', default=None, help='Path to file to open.')
+_PARSER.add_argument('--untitled', action='store_true', help='Start a new Untitled buffer.')
+_PARSER.add_argument('--sline', type=int, help='Start line.')
+_PARSER.add_argument('--eline', type=int, help='End line.')
+_PARSER.add_argument('--scol', type=int, help='Start column.')
+_PARSER.add_argument('--ecol', type=int, help='End column.')
+_PARSER.add_argument('--replace-text', type=str, help='Text to insert.')
+_PARSER.add_argument('--autosave', action='store_true', help='Autosave after replace.')
+_PARSER.add_argument('--theme', type=str, default='vs-dark', help='vs, vs-dark.')
+_PARSER.add_argument('--lang', type=str, help='Force language.')
+_PARSER.add_argument('--read-only', action='store_true', help='Read-only mode.')
+_PARSER.add_argument('--cdn', action='store_true', help='Load Monaco from the jsDelivr CDN instead of assets/vs.')
+_PARSER.add_argument('--features', action='store_true', help='Enable minimap, folding and highlight decorations.')
+
+# Headless Arguments
+_PARSER.add_argument('--regex-find', type=str, help='[HEADLESS] Regex pattern.')
+_PARSER.add_argument('--regex-replace', type=str, help='[HEADLESS] Replacement string.')
+_PARSER.add_argument('--regex-flags', type=str, default='', help='[HEADLESS] Regex flags, any of: i, m, s, x.')
+
+# File extension -> Monaco language id for the boot buffer
+_EXT_LANG: dict[str, str] = {
+    '.py':'python','.js':'javascript','.ts':'typescript','.json':'json',
+    '.md':'markdown','.html':'html','.css':'css','.txt':'plaintext',
+    '.c':'c','.cpp':'cpp','.h':'c','.hpp':'cpp','.sh':'shell','.ini':'ini',
+    '.rs':'rust','.go':'go','.java':'java','.kt':'kotlin','.yaml':'yaml','.yml':'yaml',
+    '.toml':'ini','.xml':'xml',
+}
+
+_REGEX_FLAGS = {'i': re.IGNORECASE, 'm': re.MULTILINE, 's': re.DOTALL, 'x': re.VERBOSE}
+
+# Line safety is read off the parsed pattern rather than its source text
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse
+
+_NL = ord('\n')
+_NL_CATEGORIES = {_sre_parse.CATEGORY_SPACE, _sre_parse.CATEGORY_NOT_DIGIT,
+                  _sre_parse.CATEGORY_NOT_WORD, _sre_parse.CATEGORY_LINEBREAK}
+_REPEATS = {getattr(_sre_parse, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+            if hasattr(_sre_parse, name)}
+
+def _class_has_newline(items) -> bool:
+    negate = hit = False
+    for op, av in items:
+        if op is _sre_parse.NEGATE:
+            negate = True
+        elif op is _sre_parse.LITERAL:
+            hit = hit or av == _NL
+        elif op is _sre_parse.RANGE:
+            hit = hit or av[0] <= _NL <= av[1]
+        elif op is _sre_parse.CATEGORY:
+            hit = hit or av in _NL_CATEGORIES
+        else:
+            return True
+    return hit != negate
+
+def _can_span_lines(items, dotall: bool) -> bool:
+    """True if an atom of the parsed pattern can match '\n' or anchors on a line/string edge."""
+    for op, av in items:
+        if op is _sre_parse.LITERAL:
+            if av == _NL:
+                return True
+        elif op is _sre_parse.NOT_LITERAL:
+            if av != _NL:
+                return True
+        elif op is _sre_parse.ANY:
+            if dotall:
+                return True
+        elif op is _sre_parse.IN:
+            if _class_has_newline(av):
+                return True
+        elif op is _sre_parse.AT:
+            # \b and \B see the same neighbours either way; ^ $ \A \Z do not
+            if av not in (_sre_parse.AT_BOUNDARY, _sre_parse.AT_NON_BOUNDARY):
+                return True
+        elif op is _sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            sub_dotall = (dotall or bool(add_flags & re.DOTALL)) and not del_flags & re.DOTALL
+            if _can_span_lines(sub, sub_dotall):
+                return True
+        elif op is _sre_parse.BRANCH:
+            if any(_can_span_lines(branch, dotall) for branch in av[1]):
+                return True
+        elif op in _REPEATS:
+            if _can_span_lines(av[2], dotall):
+                return True
+        elif op in (_sre_parse.ASSERT, _sre_parse.ASSERT_NOT):
+            if _can_span_lines(av[1], dotall):
+                return True
+        elif op is getattr(_sre_parse, 'ATOMIC_GROUP', None):
+            if _can_span_lines(av, dotall):
+                return True
+        elif op is _sre_parse.GROUPREF_EXISTS:
+            if any(_can_span_lines(branch, dotall) for branch in av[1:] if branch):
+                return True
+        elif op is not _sre_parse.GROUPREF:
+            # Anything unrecognised goes the safe way
+            return True
+    return False
+
+def _line_safe(pat: re.Pattern) -> bool:
+    """True if applying pat line by line gives the same result as on the whole text.
+
+    That holds when it can't match empty (an empty match would land on both sides of a
+    line join) and none of its atoms can match '\n' or anchor on a line edge.
+    """
+    try:
+        parsed = _sre_parse.parse(pat.pattern, pat.flags)
+    except Exception:
+        return False
+    return parsed.getwidth()[0] > 0 and not _can_span_lines(parsed, bool(pat.flags & re.DOTALL))
+
+def _newline_for(newlines) -> str:
+    """The file's own line ending from a universal-newline read; mixed or none falls back to the platform's."""
+    return newlines if isinstance(newlines, str) else os.linesep
+
+_WRITE_SLICE_CHARS = 1 << 20
+
+def _universal_newlines(text: str) -> tuple[str, str]:
+    """text with CRLF and CR endings turned into LF, plus the line ending _newline_for would report for it."""
+    if '\r' not in text:
+        return text, '\n' if '\n' in text else os.linesep
+    crlf = text.count('\r\n')
+    kinds = [nl for nl, n in (('\r\n', crlf), ('\r', text.count('\r') - crlf), ('\n', text.count('\n') - crlf)) if n]
+    return text.replace('\r\n', '\n').replace('\r', '\n'), kinds[0] if len(kinds) == 1 else os.linesep
+
+def _replace_whole_file(target: str, pat: re.Pattern, repl: str) -> tuple[int, bool]:
+    content, newline = _universal_newlines(read_file_text(target, errors='strict'))
+    new_content, count = pat.subn(repl, content)
+    if new_content == content:
+        return count, False
+    del content
+    # Known to differ, so no compare: stream the text out in slices so the newline
+    # translation and UTF-8 encoding never hold a second full copy
+    f, target = open_save_target(target, 'w', encoding='utf-8', newline=newline)
+    try:
+        with f:
+            for i in range(0, len(new_content), _WRITE_SLICE_CHARS):
+                f.write(new_content[i:i + _WRITE_SLICE_CHARS])
+            f.flush()
+            os.fsync(f.fileno())
+        replace_from_tmp(f.name, target)
+    except BaseException:
+        if f.name != target:
+            with contextlib.suppress(OSError):
+                os.unlink(f.name)
+        raise
+    return count, True
+
+def _replace_by_line(target: str, pat: re.Pattern, repl: str) -> tuple[int, bool] | None:
+    """Streams the file through a sibling temp file; None if it can't (hard-linked, or no temp allowed)."""
+    from tempfile import NamedTemporaryFile
+    # First pass only looks for a change, and reads to EOF so f.newlines covers the whole file
+    with open(target, 'r', encoding='utf-8') as f:
+        changed = any(pat.sub(repl, line) != line for line in f)
+        for _ in f:
+            pass
+        newline = _newline_for(f.newlines)
+    if not changed:
+        return 0, False
+    if os.stat(target).st_nlink > 1:
+        return None
+    try:
+        tmp = NamedTemporaryFile(mode='w', encoding='utf-8', newline=newline, delete=False,
+                                 dir=os.path.dirname(target), prefix='.monaco-', suffix='.tmp')
+    except OSError:
+        return None
+    count = 0
+    try:
+        with tmp, open(target, 'r', encoding='utf-8') as fin:
+            for line in fin:
+                new_line, n = pat.subn(repl, line)
+                count += n
+                tmp.write(new_line)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        replace_from_tmp(tmp.name, target)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp.name)
+        raise
+    return count, True
+
+def headless_regex_replace(path: str, pat: re.Pattern, repl: str) -> tuple[int, bool]:
+    """Applies pat.subn to a file's text and atomically replaces the file if that changed anything.
+
+    The text is read with universal newlines, as the editor sees it, and written back with the
+    file's own line ending. Line-safe patterns are streamed; the rest run on the whole file.
+    """
+    target = os.path.realpath(path)
+    if _line_safe(pat):
+        result = _replace_by_line(target, pat, repl)
+        if result is not None:
+            return result
+    return _replace_whole_file(target, pat, repl)
+
 def run_cli():
     """Handles command-line arguments for headless tasks or configured GUI launch."""
-    ap = argparse.ArgumentParser(description='Monaco Viewer - Code Editor & Utility')
-    
-    # GUI Arguments
-    ap.add_argument('--file', nargs='?', default=None, help='Path to file to open.')
-    ap.add_argument('--untitled', action='store_true', help='Start a new Untitled buffer.')
-    ap.add_argument('--sline', type=int, help='Start line.')
-    ap.add_argument('--eline', type=int, help='End line.')
-    ap.add_argument('--scol', type=int, help='Start column.')
-    ap.add_argument('--ecol', type=int, help='End column.')
-    ap.add_argument('--replace-text', type=str, help='Text to insert.')
-    ap.add_argument('--autosave', action='store_true', help='Autosave after replace.')
-    ap.add_argument('--theme', type=str, default='vs-dark', help='vs, vs-dark.')
-    ap.add_argument('--lang', type=str, help='Force language.')
-    ap.add_argument('--read-only', action='store_true', help='Read-only mode.')
-
-    # Headless Arguments
-    ap.add_argument('--regex-find', type=str, help='[HEADLESS] Regex pattern.')
-    ap.add_argument('--regex-replace', type=str, help='[HEADLESS] Replacement string.')
-
-    args = ap.parse_args()
+    args = _PARSER.parse_args()
 
     # --- Headless Logic ---
     if args.regex_find and args.regex_replace:
@@ -287,15 +731,18 @@ def run_cli():
         if not os.path.exists(args.file):        
             print(f"[error] File not found: {args.file}", file=sys.stderr)
             sys.exit(1)
+        unknown_flags = set(args.regex_flags) - _REGEX_FLAGS.keys()
+        if unknown_flags:
+            print(f"[error] Unknown --regex-flags: {''.join(sorted(unknown_flags))} (use any of: imsx)", file=sys.stderr)
+            sys.exit(2)
+        flags = 0
+        for c in args.regex_flags:
+            flags |= _REGEX_FLAGS[c]
         try:
-            with open(args.file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            new_content, count = re.subn(args.regex_find, args.regex_replace, content)
-
-            if content != new_content:
-                with open(args.file, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
+            pat = re.compile(args.regex_find, flags)
+            count, changed = headless_regex_replace(args.file, pat, args.regex_replace)
+
+            if changed:
                 print(f"Successfully made {count} replacement(s) in {args.file}")
             else:
                 print("No matches found. File was not changed.")
@@ -305,26 +752,30 @@ def run_cli():
         sys.exit(0)
 
     # --- Configured GUI Launch ---
-    # Handle temp file for "Untitled" logic
-    if args.untitled or args.file is None:
-        from tempfile import NamedTemporaryFile
-        tmp = NamedTemporaryFile(mode="w+", suffix=".txt", prefix="Untitled-", delete=False)
-        tmp.close()
-        args.file = tmp.name
-
-    # Infer language
-    if not args.lang and args.file:
-        ext = os.path.splitext(args.file)[1].lower()
-        args.lang = {
-            '.py':'python','.js':'javascript','.ts':'typescript','.json':'json',
-            '.md':'markdown','.html':'html','.css':'css','.txt':'plaintext',
-            '.c':'c','.cpp':'cpp','.h':'c','.hpp':'cpp','.sh':'shell','.ini':'ini',
-        }.get(ext, 'plaintext')
+    # "Untitled" is an in-memory buffer with no backing file until it is saved
+    is_untitled = args.untitled or not args.file
+    if is_untitled:
+        args.file = None
+
+    # Split the path once; run_gui and the language lookup both reuse the pieces
+    args.file = os.path.abspath(args.file) if args.file else None
+    base = os.path.split(args.file)[1] if args.file else ""
+
+    # Infer language; a --lang given on the command line is honoured even when it is plaintext
+    lang_forced = bool(args.lang)
+    if not lang_forced:
+        stem, _, ext = base.rpartition('.')
+        ext = '.' + ext.lower() if stem else ''
+        args.lang = _EXT_LANG.get(ext, 'plaintext')
+    # Long-lived in the boot dict and compared on every tab switch
+    args.theme = sys.intern(args.theme)
+    args.lang = sys.intern(args.lang)
 
     run_gui(
         file=args.file, sline=args.sline, eline=args.eline, scol=args.scol, ecol=args.ecol,
         replace_text=args.replace_text, autosave=args.autosave, theme=args.theme,
-        lang=args.lang, read_only=args.read_only
+        lang=args.lang, read_only=args.read_only, cdn=args.cdn, features=args.features,
+        base=base, is_untitled=is_untitled, lang_forced=lang_forced
     )
 
 def main():
@@ -333,10 +784,7 @@ def main():
         run_cli()
     else:
         # Default Showcase / Empty Launch
-        from tempfile import NamedTemporaryFile
-        tmp = NamedTemporaryFile(mode="w+", suffix=".txt", prefix="Untitled-", delete=False)
-        tmp.close()
-        run_gui(file=tmp.name, theme='vs-dark', lang='plaintext')
+        run_gui(theme='vs-dark', lang='plaintext', is_untitled=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import os
+import re
+import tempfile
+import unittest
+
+from src.app import _line_safe, headless_regex_replace
+
+
+class HeadlessRegexReplaceTests(unittest.TestCase):
+    """Headless results must match a single re.subn over the file's universal-newline text."""
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.dir = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def write(self, name, data: bytes) -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def read(self, path) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def assert_matches_whole_file(self, data: bytes, pattern: str, repl: str):
+        path = self.write('f.txt', data)
+        count, changed = headless_regex_replace(path, re.compile(pattern), repl)
+        expected, expected_count = re.subn(pattern, repl, data.decode('utf-8').replace('\r\n', '\n'))
+        self.assertEqual(changed, expected != data.decode('utf-8').replace('\r\n', '\n'))
+        if changed:
+            self.assertEqual(count, expected_count)
+        self.assertEqual(self.read(path).decode('utf-8').replace('\r\n', '\n'), expected)
+
+    def test_crlf_is_kept_and_hidden_from_the_pattern(self):
+        path = self.write('f.txt', b'foo xyz\r\nbar\r\n')
+        self.assertEqual(headless_regex_replace(path, re.compile('foo.*'), 'Q'), (1, True))
+        self.assertEqual(self.read(path), b'Q\r\nbar\r\n')
+        self.assertEqual(headless_regex_replace(path, re.compile('bar$'), 'X'), (1, True))
+        self.assertEqual(self.read(path), b'Q\r\nX\r\n')
+
+    def test_line_safe_literal_streams_with_crlf(self):
+        path = self.write('f.txt', b'a1\r\nb1\r\n')
+        self.assertEqual(headless_regex_replace(path, re.compile('1'), '2'), (2, True))
+        self.assertEqual(self.read(path), b'a2\r\nb2\r\n')
+
+    def test_class_containing_newline_spans_lines(self):
+        self.assert_matches_whole_file(b'abc\ndef\n', r'[\x00-\x7f]+', 'Z')
+
+    def test_empty_matches_are_not_doubled_at_line_joins(self):
+        self.assert_matches_whole_file(b'ab\ncd\n', 'x*', '-')
+
+    def test_line_safe_patterns_agree_with_whole_file(self):
+        for pattern in ('b', r'\d+', 'a.c', r'\w+', 'ab|cd', 'a.*c', '[0-9]+', 'c?d', r'\bcd\b', '(?<!a)c'):
+            with self.subTest(pattern=pattern):
+                self.assert_matches_whole_file(b'abc 12\ncd a-c\n', pattern, '_')
+
+    def test_line_safety_classification(self):
+        for pattern in ('foo.*bar', '[0-9]+', 'colou?r', 'TODO|FIXME', r'\bfoo\b', r'[^\n]+', '(?m)a'):
+            with self.subTest(pattern=pattern):
+                self.assertTrue(_line_safe(re.compile(pattern)))
+        for pattern in ('x*', 'a|', 'bar$', '^a', r'a\Z', r'\s+', r'\D', '[^"]+', r'[\x00-\x7f]+', '(?s:a.)', '(?s)a.'):
+            with self.subTest(pattern=pattern):
+                self.assertFalse(_line_safe(re.compile(pattern)))
+
+    def test_whole_file_mode_keeps_crlf(self):
+        path = self.write('f.txt', b'a\r\nb\r\n')
+        self.assertEqual(headless_regex_replace(path, re.compile(r'a\nb'), 'x\ny'), (1, True))
+        self.assertEqual(self.read(path), b'x\r\ny\r\n')
+
+    def test_large_file_whole_file_mode(self):
+        # Over the mmap threshold; newlines are translated by hand on that path
+        path = self.write('f.txt', b'line a\r\n' * 200000)
+        self.assertEqual(headless_regex_replace(path, re.compile(r'a\n'), 'b\n'), (200000, True))
+        self.assertEqual(self.read(path), b'line b\r\n' * 200000)
+
+    def test_no_match_leaves_directory_untouched(self):
+        path = self.write('f.txt', b'abc\n')
+        self.assertEqual(headless_regex_replace(path, re.compile('zzz'), 'y'), (0, False))
+        self.assertEqual(os.listdir(self.dir), ['f.txt'])
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), 'needs symlinks')
+    def test_symlink_is_kept_and_target_updated(self):
+        target = self.write('target.txt', b'old\n')
+        link = os.path.join(self.dir, 'link.txt')
+        try:
+            os.symlink(target, link)
+        except OSError:
+            self.skipTest('symlinks not permitted')
+        headless_regex_replace(link, re.compile('old'), 'new')
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(self.read(target), b'new\n')
+
+
+if __name__ == '__main__':
+    unittest.main()